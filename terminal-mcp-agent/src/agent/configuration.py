@@ -39,6 +39,27 @@ class Configuration(BaseModel):
         metadata={"description": "The maximum number of research loops to perform."},
     )
 
+    semantic_cache: bool = Field(
+        default=False,
+        metadata={
+            "description": "Whether to reuse the parse of a near-duplicate earlier command, matched by embedding similarity."
+        },
+    )
+
+    context_cache: bool = Field(
+        default=False,
+        metadata={
+            "description": "Whether to upload the static parser instructions as Gemini cached content (only used when they reach the model's caching minimum)."
+        },
+    )
+
+    fused: bool = Field(
+        default=False,
+        metadata={
+            "description": "Whether to parse, execute and format each command in a single graph node instead of three."
+        },
+    )
+
     @classmethod
     def from_runnable_config(
         cls, config: Optional[RunnableConfig] = None
@@ -1,16 +1,42 @@
 """LangGraph workflow for the Terminal MCP agent."""
 
+import asyncio
+import functools
+import hashlib
+import json
 import logging
+import math
 import os
-
+import pickle
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from datetime import timedelta
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import numpy as np
+import orjson
 from dotenv import load_dotenv
-from langchain_core.runnables import RunnableConfig
-from langchain_google_genai import ChatGoogleGenerativeAI
+from google import genai
+from google.genai import errors as genai_errors
+from google.genai import types
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from langgraph.graph import END, START, StateGraph
-from pydantic import ValidationError
+from pydantic import BaseModel, TypeAdapter, ValidationError
 
 from .configuration import Configuration  # Will be used for model config
-from .prompts import COMMAND_PARSER_INSTRUCTIONS, get_current_date
+from .prompts import (
+    COMMAND_PARSER_COMMAND_PROMPT,
+    COMMAND_PARSER_INSTRUCTIONS,
+    COMMAND_PARSER_STATIC_INSTRUCTIONS,
+    build_command_parser_prompt,
+)
 from .state import AgentState
 from .tools_and_schemas import (
     CreateDirectoryTool,
@@ -28,70 +54,618 @@ if not GEMINI_API_KEY:
 
 logger = logging.getLogger(__name__)
 
+# Tool name -> schema class, and a compiled argument validator for each
+_TOOL_MAP: dict[str, type[BaseModel]] = {
+    cls.__name__: cls for cls in (ListFilesTool, ReadFileTool, CreateDirectoryTool)
+}
+_TOOL_ADAPTERS: dict[str, TypeAdapter] = {name: TypeAdapter(cls) for name, cls in _TOOL_MAP.items()}
+
+# --- Fast Path ---
+
+# A single path argument: a quoted string (quotes removed), or one bare token that
+# neither starts with a quote nor is an option flag. Quoted and bare forms get
+# separate groups so only real surrounding quotes are ever stripped.
+_PATH_ARG = r"""(?:'(?P<single_quoted>[^']+)'|"(?P<double_quoted>[^"]+)"|(?P<bare>(?![-'"])\S+))"""
+
+# Bare arguments that are filler words rather than paths ("read me", "ls in",
+# "create a folder called"); commands ending in one of these go to Gemini.
+_AMBIGUOUS_BARE_ARGS = frozenset({
+    "a", "all", "an", "called", "directories", "dirs", "everything", "file", "files",
+    "folders", "in", "it", "me", "that", "the", "them", "this",
+})
+
+# (pattern, tool_name, default path) for commands that need no LLM to understand.
+# Anything with flags, extra words or several arguments falls through to Gemini.
+_FAST_PATH = [
+    (
+        re.compile(rf"^\s*(?:ls|list\s+files)(?:\s+(?:in\s+)?{_PATH_ARG})?\s*$", re.I),
+        ListFilesTool.__name__,
+        ".",
+    ),
+    (
+        re.compile(rf"^\s*(?:cat|read)\s+{_PATH_ARG}\s*$", re.I),
+        ReadFileTool.__name__,
+        None,
+    ),
+    (
+        re.compile(
+            rf"^\s*(?:mkdir|create\s+(?:a\s+)?(?:folder|directory|dir)(?:\s+called)?)\s+{_PATH_ARG}\s*$",
+            re.I,
+        ),
+        CreateDirectoryTool.__name__,
+        None,
+    ),
+]
+
+
+def _match_fast_path(user_command: str) -> Optional[ParsedCommand]:
+    """Recognize unambiguous ls/cat/mkdir style commands without calling Gemini."""
+    for pattern, tool_name, default_path in _FAST_PATH:
+        m = pattern.match(user_command)
+        if not m:
+            continue
+        bare = m.group("bare")
+        if bare is not None and bare.lower() in _AMBIGUOUS_BARE_ARGS:
+            return None
+        path = bare or m.group("single_quoted") or m.group("double_quoted") or default_path
+        return ParsedCommand(tool_name=tool_name, args={"path": path})
+    return None
+
+# --- Parse Cache ---
+
+PARSE_CACHE_PATH = Path.home() / ".cache" / "terminal-mcp-agent" / "parse_cache.pkl"
+PARSE_CACHE_MAX_ENTRIES = 1024
+SEMANTIC_CACHE_THRESHOLD = 0.97
+EMBEDDING_MODEL = "models/embedding-001"
+
+# Persisted entries are reused only if they were produced under the same prompts,
+# response schema and embedding model; any change to these invalidates the file.
+_PARSE_CACHE_VERSION = hashlib.sha256(
+    "\0".join((
+        COMMAND_PARSER_INSTRUCTIONS,
+        COMMAND_PARSER_STATIC_INSTRUCTIONS,
+        COMMAND_PARSER_COMMAND_PROMPT,
+        orjson.dumps(ParsedCommand.model_json_schema(), option=orjson.OPT_SORT_KEYS).decode(),
+        EMBEDDING_MODEL,
+    )).encode()
+).hexdigest()
+
+
+class _CacheEntry(NamedTuple):
+    model: str
+    parsed_result: ParsedCommand
+    # Unit-norm embedding of the command, or None if the semantic tier was off
+    vector: Optional[np.ndarray]
+
+
+# Guards _parse_cache, _semantic_indexes and _save_pending; sync nodes run on a thread pool
+_parse_cache_lock = threading.Lock()
+# SHA-256 of model + normalized command -> entry, least recently used first
+_parse_cache: OrderedDict[str, _CacheEntry] = OrderedDict()
+# Model -> (matrix of embedded entries, their parses); rebuilt lazily after a change.
+# Each index is immutable once built, so it can be scored outside the lock.
+_semantic_indexes: dict[str, tuple[np.ndarray, list[ParsedCommand]]] = {}
+# Whether a save is already queued on the writer, so bursts of stores share one write
+_save_pending = False
+_parse_cache_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="parse-cache-writer")
+
+
+def _normalize_command(user_command: str) -> str:
+    # Case is preserved on purpose: "cat README.md" and "cat readme.md" name different files
+    return " ".join(user_command.split())
+
+
+def _parse_cache_key(user_command: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\0{_normalize_command(user_command)}".encode()).hexdigest()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_embeddings() -> GoogleGenerativeAIEmbeddings:
+    return GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=GEMINI_API_KEY)
+
+
+def _unit_vector(embedding: list[float]) -> np.ndarray:
+    """Normalize an embedding so a dot product against the matrix is cosine similarity."""
+    vector = np.asarray(embedding, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+# The semantic tier is only a cache: if embedding fails, the command is parsed
+# by Gemini as usual and its result is stored without a vector.
+
+def _embed_command(user_command: str) -> Optional[np.ndarray]:
+    try:
+        return _unit_vector(_get_embeddings().embed_query(_normalize_command(user_command)))
+    except Exception as e:
+        logger.warning("Embedding failed, skipping the semantic parse cache: %s", e)
+        return None
+
+
+async def _aembed_command(user_command: str) -> Optional[np.ndarray]:
+    try:
+        return _unit_vector(await _get_embeddings().aembed_query(_normalize_command(user_command)))
+    except Exception as e:
+        logger.warning("Embedding failed, skipping the semantic parse cache: %s", e)
+        return None
+
+
+def _embed_commands(user_commands: list[str]) -> Optional[list[np.ndarray]]:
+    try:
+        embeddings = _get_embeddings().embed_documents(
+            [_normalize_command(command) for command in user_commands],
+            task_type="RETRIEVAL_QUERY",  # Match the vectors embed_query stores
+        )
+    except Exception as e:
+        logger.warning("Embedding failed, skipping the semantic parse cache: %s", e)
+        return None
+    return [_unit_vector(embedding) for embedding in embeddings]
+
+
+def _lookup_exact(key: str) -> Optional[ParsedCommand]:
+    """Return the cached parse stored under key, marking it as recently used."""
+    with _parse_cache_lock:
+        entry = _parse_cache.get(key)
+        if entry is None:
+            return None
+        _parse_cache.move_to_end(key)
+        return entry.parsed_result
+
+
+def _lookup_semantic(vector: np.ndarray, model: str) -> Optional[ParsedCommand]:
+    """Return the cached parse of the most similar prior command, if it is close enough."""
+    with _parse_cache_lock:
+        index = _semantic_indexes.get(model)
+        if index is None:
+            entries = [e for e in _parse_cache.values() if e.model == model and e.vector is not None]
+            if not entries:
+                return None
+            index = (np.stack([e.vector for e in entries]), [e.parsed_result for e in entries])
+            _semantic_indexes[model] = index
+
+    matrix, results = index
+    scores = matrix @ vector
+    best = int(np.argmax(scores))
+    if scores[best] >= SEMANTIC_CACHE_THRESHOLD:
+        return results[best]
+    return None
+
+
+def _load_parse_cache() -> None:
+    """Warm the cache from disk, ignoring a missing, unreadable or outdated file."""
+    if not PARSE_CACHE_PATH.exists():
+        return
+    try:
+        with PARSE_CACHE_PATH.open("rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != _PARSE_CACHE_VERSION:
+            logger.info("Discarding parse cache at %s built for other prompts or schema", PARSE_CACHE_PATH)
+            return
+        _parse_cache.update(data["entries"][-PARSE_CACHE_MAX_ENTRIES:])
+    except Exception as e:
+        logger.warning("Ignoring unreadable parse cache at %s: %s", PARSE_CACHE_PATH, e)
+
+
+def _save_parse_cache() -> None:
+    """Persist a snapshot of the cache so restarts begin warm. Runs on the writer thread."""
+    global _save_pending
+    with _parse_cache_lock:
+        _save_pending = False
+        entries = list(_parse_cache.items())
+
+    tmp_path = None
+    try:
+        PARSE_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        # A unique temp file per write, so concurrent processes never share one
+        with tempfile.NamedTemporaryFile(
+            dir=PARSE_CACHE_PATH.parent, prefix=f"{PARSE_CACHE_PATH.name}.", suffix=".tmp", delete=False
+        ) as f:
+            tmp_path = Path(f.name)
+            pickle.dump({"version": _PARSE_CACHE_VERSION, "entries": entries}, f)
+        tmp_path.replace(PARSE_CACHE_PATH)
+    except Exception as e:
+        logger.warning("Could not persist parse cache to %s: %s", PARSE_CACHE_PATH, e)
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
+
+
+def _store_parse_result(key: str, model: str, vector: Optional[np.ndarray], parsed_result: ParsedCommand) -> None:
+    """Record a successful LLM parse and queue a background save."""
+    global _save_pending
+    with _parse_cache_lock:
+        old = _parse_cache.pop(key, None)
+        _parse_cache[key] = _CacheEntry(model, parsed_result, vector)
+        evicted = []
+        while len(_parse_cache) > PARSE_CACHE_MAX_ENTRIES:
+            evicted.append(_parse_cache.popitem(last=False)[1])
+        if any(e is not None and e.vector is not None for e in (old, _parse_cache[key], *evicted)):
+            _semantic_indexes.clear()
+        if _save_pending:
+            return
+        _save_pending = True
+    _parse_cache_writer.submit(_save_parse_cache)
+
+
+_load_parse_cache()
+
+# --- Context Cache ---
+
+CONTEXT_CACHE_TTL = timedelta(hours=1)
+# Refresh slightly before expiry so an in-flight request never races the deadline
+CONTEXT_CACHE_REFRESH_MARGIN = timedelta(minutes=5)
+# Gemini refuses to cache less than this; smaller prompts are never uploaded
+CONTEXT_CACHE_MIN_TOKENS = 1024
+
+_genai_client = genai.Client(api_key=GEMINI_API_KEY)
+# Serializes handle creation, refresh and deletion so concurrent first calls share one handle
+_context_cache_lock = threading.Lock()
+# Model name -> (cached content name, or None if caching is unavailable; monotonic time
+# until which the entry stands). An unavailable entry defers the next attempt.
+_context_caches: dict[str, tuple[Optional[str], float]] = {}
+
+
+def _context_cache_entry_is_current(expires_at: float) -> bool:
+    return time.monotonic() < expires_at - CONTEXT_CACHE_REFRESH_MARGIN.total_seconds()
+
+
+def _create_context_cache(model: str, ttl: str) -> tuple[Optional[str], float]:
+    """Upload the static instructions, unless they are too small for the model to cache."""
+    now = time.monotonic()
+    token_count = _genai_client.models.count_tokens(
+        model=model, contents=COMMAND_PARSER_STATIC_INSTRUCTIONS
+    ).total_tokens
+    if token_count is not None and token_count < CONTEXT_CACHE_MIN_TOKENS:
+        logger.info(
+            "Parser instructions are %d tokens, below the %d-token caching minimum; not caching for %s",
+            token_count, CONTEXT_CACHE_MIN_TOKENS, model,
+        )
+        # The instructions are static, so this will not change for the process lifetime
+        return None, math.inf
+    cached_content = _genai_client.caches.create(
+        model=model,
+        config=types.CreateCachedContentConfig(
+            contents=[COMMAND_PARSER_STATIC_INSTRUCTIONS],
+            ttl=ttl,
+        ),
+    )
+    return cached_content.name, now + CONTEXT_CACHE_TTL.total_seconds()
+
+
+def _get_context_cache(model: str) -> Optional[str]:
+    """Return a live cached-content handle for the static parser instructions.
+
+    The handle is created on first use per model and its TTL is extended when it
+    nears expiry. Returns None if the model or prompt cannot be cached, in which
+    case the next attempt is deferred for one TTL period (or for good, if the
+    instructions are below the caching minimum).
+    """
+    name, expires_at = _context_caches.get(model, (None, 0.0))
+    if _context_cache_entry_is_current(expires_at):
+        return name
+
+    with _context_cache_lock:
+        # Another thread may have created or refreshed the handle while we waited
+        name, expires_at = _context_caches.get(model, (None, 0.0))
+        if _context_cache_entry_is_current(expires_at):
+            return name
+
+        ttl = f"{int(CONTEXT_CACHE_TTL.total_seconds())}s"
+        entry = None
+        if name is not None:
+            try:
+                _genai_client.caches.update(name=name, config=types.UpdateCachedContentConfig(ttl=ttl))
+                entry = (name, time.monotonic() + CONTEXT_CACHE_TTL.total_seconds())
+            except Exception as e:
+                logger.debug("Could not refresh context cache %s, recreating: %s", name, e)
+        if entry is None:
+            try:
+                entry = _create_context_cache(model, ttl)
+            except Exception as e:
+                logger.warning("Context caching unavailable for %s, sending full prompts: %s", model, e)
+                entry = (None, time.monotonic() + CONTEXT_CACHE_TTL.total_seconds())
+
+        _context_caches[model] = entry
+        return entry[0]
+
+
+def _is_dead_context_cache_error(error: BaseException) -> bool:
+    """Tell whether a failed request means its cached-content handle no longer works.
+
+    langchain-google-genai re-raises google-genai client errors as its own types,
+    so the cause chain is searched for the original. Only not-found and
+    permission-denied mean the handle is gone; rate limits, timeouts and bad
+    replies leave it usable.
+    """
+    while error is not None:
+        if isinstance(error, genai_errors.ClientError):
+            return error.code in (403, 404)
+        error = error.__cause__
+    return False
+
+
+def _drop_context_cache(model: str, cached_content: str, error: Exception) -> None:
+    """Delete a handle that failed a request and defer recreating it for one TTL period."""
+    with _context_cache_lock:
+        if _context_caches.get(model, (None, 0.0))[0] != cached_content:
+            return  # Already dropped or replaced by another caller
+        logger.warning("Parsing with cached context %s failed, sending full prompts: %s", cached_content, error)
+        _context_caches[model] = (None, time.monotonic() + CONTEXT_CACHE_TTL.total_seconds())
+        try:
+            _genai_client.caches.delete(name=cached_content)
+        except Exception as e:
+            # It may already be gone server-side; either way it will expire on its own
+            logger.debug("Could not delete context cache %s: %s", cached_content, e)
+
+
+# Low temperature for more deterministic parsing
+PARSER_TEMPERATURE = 0.1
+# Upper bound on concurrent Gemini requests issued by parse_user_commands_batch
+PARSE_BATCH_MAX_CONCURRENCY = 8
+
+# Derived once: the response schema sent to Gemini and the validator for its replies
+_PARSED_COMMAND_SCHEMA = ParsedCommand.model_json_schema()
+_PARSED_COMMAND_ADAPTER = TypeAdapter(ParsedCommand)
+
+
+@functools.lru_cache(maxsize=8)
+def _get_structured_llm(model: str, temperature: float, cached_content: Optional[str] = None):
+    """Build the ParsedCommand-structured Gemini client once per configuration."""
+    llm = ChatGoogleGenerativeAI(
+        model=model,
+        temperature=temperature,
+        api_key=GEMINI_API_KEY,
+        cached_content=cached_content,
+    )
+    # For structured output, we tell the LLM to fill our ParsedCommand schema.
+    # Passing the precomputed JSON schema makes replies come back as plain dicts,
+    # which _finish_llm_parse validates with _PARSED_COMMAND_ADAPTER.
+    return llm.with_structured_output(schema=_PARSED_COMMAND_SCHEMA, method="json_schema", include_raw=False)
+
+
+def _parser_prompt(user_command: str, cached: bool) -> str:
+    """Build the parser prompt; with cached instructions only the per-call part is sent."""
+    if cached:
+        return COMMAND_PARSER_COMMAND_PROMPT.format(user_command=user_command)
+    return build_command_parser_prompt(user_command)
+
+
+def _invoke_parser(user_command: str, model: str, context_cache: bool) -> dict:
+    """Ask Gemini to parse the command, reusing cached instructions if enabled and available."""
+    cached_content = _get_context_cache(model) if context_cache else None
+    if cached_content is not None:
+        structured_llm = _get_structured_llm(model, PARSER_TEMPERATURE, cached_content)
+        try:
+            return structured_llm.invoke(_parser_prompt(user_command, cached=True))
+        except Exception as e:
+            if not _is_dead_context_cache_error(e):
+                raise
+            _drop_context_cache(model, cached_content, e)
+
+    structured_llm = _get_structured_llm(model, PARSER_TEMPERATURE)
+    return structured_llm.invoke(_parser_prompt(user_command, cached=False))
+
+
+async def _ainvoke_parser(user_command: str, model: str, context_cache: bool) -> dict:
+    """Async counterpart of _invoke_parser."""
+    # Managing the handle takes blocking google-genai calls; keep them off the loop
+    cached_content = await asyncio.to_thread(_get_context_cache, model) if context_cache else None
+    if cached_content is not None:
+        structured_llm = _get_structured_llm(model, PARSER_TEMPERATURE, cached_content)
+        try:
+            return await structured_llm.ainvoke(_parser_prompt(user_command, cached=True))
+        except Exception as e:
+            if not _is_dead_context_cache_error(e):
+                raise
+            await asyncio.to_thread(_drop_context_cache, model, cached_content, e)
+
+    structured_llm = _get_structured_llm(model, PARSER_TEMPERATURE)
+    return await structured_llm.ainvoke(_parser_prompt(user_command, cached=False))
+
 # --- Node Definitions ---
 
+def _build_parse_update(parsed_result: ParsedCommand, user_command: str) -> dict:
+    """Validate a ParsedCommand against its tool schema and build the state update."""
+    if parsed_result.tool_name == "NoSuitableToolFound":
+        original_command = parsed_result.args.get('original_command', user_command)
+        error_msg = f"No suitable tool found for command: {original_command}"
+        logger.debug("No suitable tool found for command: %s", original_command)
+        return {"parsed_command": None, "error_message": error_msg}
+
+    adapter = _TOOL_ADAPTERS.get(parsed_result.tool_name)
+    if adapter is None:
+        error_msg = f"Unknown tool: {parsed_result.tool_name}"
+        logger.error("Unknown tool: %s", parsed_result.tool_name)
+        return {"parsed_command": None, "error_message": error_msg}
+
+    try:
+        validated = adapter.validate_python(parsed_result.args)
+    except ValidationError as e:
+        error_msg = f"Invalid arguments for {parsed_result.tool_name}: {e}"
+        logger.error("Invalid arguments for %s: %s", parsed_result.tool_name, e)
+        return {"parsed_command": None, "error_message": error_msg}
+
+    return {
+        "parsed_command": {
+            "tool_name": parsed_result.tool_name,
+            "args": validated.model_dump(),
+        },
+        "error_message": None,
+    }
+
+
+def _parse_error_update(error: Exception) -> dict:
+    return {"parsed_command": None, "error_message": f"Error parsing command: {str(error)}"}
+
+
+def _parse_without_llm(user_command: str, model: str) -> Optional[dict]:
+    """Return the state update for a fast-path or exact-cache hit, or None on a miss."""
+    parsed_result = _match_fast_path(user_command)
+    if parsed_result is not None:
+        logger.debug("Fast-path match, skipping LLM")
+        return _build_parse_update(parsed_result, user_command)
+
+    parsed_result = _lookup_exact(_parse_cache_key(user_command, model))
+    if parsed_result is not None:
+        logger.debug("Exact parse cache hit")
+        return _build_parse_update(parsed_result, user_command)
+    return None
+
+
+def _finish_llm_parse(output: dict, user_command: str, model: str, vector: Optional[np.ndarray]) -> dict:
+    """Validate a fresh LLM parse and cache it if it resolved to a valid tool call."""
+    logger.debug("LLM raw output: %s", output)
+    parsed_result = _PARSED_COMMAND_ADAPTER.validate_python(output)
+
+    update = _build_parse_update(parsed_result, user_command)
+    # Only cache parses that resolved to a valid tool call, so a bad LLM answer is retried
+    if update["parsed_command"] is not None:
+        _store_parse_result(_parse_cache_key(user_command, model), model, vector, parsed_result)
+    return update
+
+
 def parse_user_command(state: AgentState, config: RunnableConfig) -> dict:
     """Parse the user's command using Gemini and return a structured tool call."""
     logger.debug("Entering parse_user_command")
-    logger.debug("User command: %s", state['user_command'])
+    logger.debug("User command: %s", state.user_command)
 
     app_config = Configuration.from_runnable_config(config)
-    llm = ChatGoogleGenerativeAI(
-        model=app_config.query_generator_model, # Using query_generator_model for now
-        temperature=0.1, # Low temperature for more deterministic parsing
-        api_key=GEMINI_API_KEY
-    )
 
-    # For structured output, we tell the LLM which Pydantic model to use for its response.
-    # We want it to fill our ParsedCommand schema.
-    structured_llm = llm.with_structured_output(ParsedCommand)
+    try:
+        update = _parse_without_llm(state.user_command, app_config.query_generator_model)
+        if update is not None:
+            return update
+
+        vector = None
+        if app_config.semantic_cache:
+            vector = _embed_command(state.user_command)
+        if vector is not None:
+            parsed_result = _lookup_semantic(vector, app_config.query_generator_model)
+            if parsed_result is not None:
+                logger.debug("Semantic parse cache hit")
+                return _build_parse_update(parsed_result, state.user_command)
+
+        output = _invoke_parser(
+            state.user_command,
+            app_config.query_generator_model, # Using query_generator_model for now
+            app_config.context_cache,
+        )
+        return _finish_llm_parse(output, state.user_command, app_config.query_generator_model, vector)
+    except Exception as e:
+        logger.exception("Exception during LLM invocation or parsing: %s", e)
+        return _parse_error_update(e)
 
-    prompt = COMMAND_PARSER_INSTRUCTIONS.format(
-        current_date=get_current_date(),
-        user_command=state['user_command']
-    )
+async def aparse_user_command(state: AgentState, config: RunnableConfig) -> dict:
+    """Async variant of parse_user_command, used when the graph runs via ainvoke/astream.
 
-    try:
-        parsed_result = structured_llm.invoke(prompt)
-        logger.debug("LLM raw parsed_result: %s", parsed_result)
-        if not isinstance(parsed_result, ParsedCommand):
-            raise ValueError("LLM did not return ParsedCommand")
-        if parsed_result.tool_name == "NoSuitableToolFound":
-            error_msg = (
-                f"No suitable tool found for command: "
-                f"{parsed_result.args.get('original_command', state['user_command'])}"
-            )
-            logger.debug(error_msg)
-            return {"parsed_command": None, "error_message": error_msg}
-
-        tool_map = {
-            ListFilesTool.__name__: ListFilesTool,
-            ReadFileTool.__name__: ReadFileTool,
-            CreateDirectoryTool.__name__: CreateDirectoryTool,
-        }
-        tool_class = tool_map.get(parsed_result.tool_name)
-        if tool_class is None:
-            error_msg = f"Unknown tool: {parsed_result.tool_name}"
-            logger.error(error_msg)
-            return {"parsed_command": None, "error_message": error_msg}
+    Only network calls are awaited or moved to threads. Parse cache lookups and
+    stores run inline: they hold the cache lock for in-memory work only (at most
+    a few milliseconds to rebuild a full semantic index), and saving to disk
+    happens on the cache writer thread.
+    """
+    logger.debug("Entering aparse_user_command")
+    logger.debug("User command: %s", state.user_command)
 
-        try:
-            validated = tool_class(**parsed_result.args)
-        except ValidationError as e:
-            error_msg = f"Invalid arguments for {parsed_result.tool_name}: {e}"
-            logger.error(error_msg)
-            return {"parsed_command": None, "error_message": error_msg}
-
-        return {
-            "parsed_command": {
-                "tool_name": parsed_result.tool_name,
-                "args": validated.model_dump() if hasattr(validated, "model_dump") else validated.dict(),
-            },
-            "error_message": None,
-        }
+    app_config = Configuration.from_runnable_config(config)
+
+    try:
+        update = _parse_without_llm(state.user_command, app_config.query_generator_model)
+        if update is not None:
+            return update
+
+        vector = None
+        if app_config.semantic_cache:
+            vector = await _aembed_command(state.user_command)
+        if vector is not None:
+            parsed_result = _lookup_semantic(vector, app_config.query_generator_model)
+            if parsed_result is not None:
+                logger.debug("Semantic parse cache hit")
+                return _build_parse_update(parsed_result, state.user_command)
+
+        output = await _ainvoke_parser(
+            state.user_command, app_config.query_generator_model, app_config.context_cache
+        )
+        return _finish_llm_parse(output, state.user_command, app_config.query_generator_model, vector)
     except Exception as e:
         logger.exception("Exception during LLM invocation or parsing: %s", e)
-        return {"parsed_command": None, "error_message": f"Error parsing command: {str(e)}"}
+        return _parse_error_update(e)
+
+
+def _batch_parser(commands: list[str], model: str, cached_content: Optional[str]) -> list:
+    """Send the commands to Gemini together; failed items come back as exceptions."""
+    structured_llm = _get_structured_llm(model, PARSER_TEMPERATURE, cached_content)
+    prompts = [_parser_prompt(command, cached=cached_content is not None) for command in commands]
+    return structured_llm.batch(
+        prompts, config={"max_concurrency": PARSE_BATCH_MAX_CONCURRENCY}, return_exceptions=True
+    )
+
+
+def parse_user_commands_batch(commands: list[str], config: Optional[RunnableConfig] = None) -> list[dict]:
+    """Parse several user commands, sending all LLM-bound ones to Gemini in one batch.
+
+    Fast-path and cached commands are resolved locally, and commands sharing a
+    cache key are parsed once. The remaining ones are embedded (if the semantic
+    cache is enabled) and parsed together via structured_llm.batch; items that
+    failed because the cached instructions expired are re-sent together with
+    the full prompt. Each entry of the result is the state update that
+    parse_user_command would have returned for the command at that position.
+    """
+    app_config = Configuration.from_runnable_config(config)
+    model = app_config.query_generator_model
+    results: list[Optional[dict]] = [None] * len(commands)
+    vectors: list[Optional[np.ndarray]] = [None] * len(commands)
+
+    # Cache key -> positions of the commands that still need a parse
+    groups: dict[str, list[int]] = {}
+    for i, command in enumerate(commands):
+        results[i] = _parse_without_llm(command, model)
+        if results[i] is None:
+            groups.setdefault(_parse_cache_key(command, model), []).append(i)
+    # Each group is represented by its first command from here on
+    pending = list(groups.values())
+    outputs = []
+
+    try:
+        embedded = None
+        if pending and app_config.semantic_cache:
+            embedded = _embed_commands([commands[group[0]] for group in pending])
+        if embedded is not None:
+            unresolved = []
+            for group, vector in zip(pending, embedded):
+                parsed_result = _lookup_semantic(vector, model)
+                for i in group:
+                    vectors[i] = vector
+                    if parsed_result is not None:
+                        results[i] = _build_parse_update(parsed_result, commands[i])
+                if parsed_result is None:
+                    unresolved.append(group)
+            pending = unresolved
+
+        if pending:
+            cached_content = _get_context_cache(model) if app_config.context_cache else None
+            outputs = _batch_parser([commands[group[0]] for group in pending], model, cached_content)
+            if cached_content is not None:
+                retry = [
+                    k for k, output in enumerate(outputs)
+                    if isinstance(output, Exception) and _is_dead_context_cache_error(output)
+                ]
+                if retry:
+                    _drop_context_cache(model, cached_content, outputs[retry[0]])
+                    retried = _batch_parser([commands[pending[k][0]] for k in retry], model, None)
+                    for k, output in zip(retry, retried):
+                        outputs[k] = output
+    except Exception as e:
+        logger.exception("Exception during batched LLM invocation: %s", e)
+        return [r if r is not None else _parse_error_update(e) for r in results]
+
+    for group, output in zip(pending, outputs):
+        for i in group:
+            try:
+                if isinstance(output, Exception):
+                    raise output
+                results[i] = _finish_llm_parse(output, commands[i], model, vectors[i])
+            except Exception as e:
+                logger.exception("Exception during LLM invocation or parsing: %s", e)
+                results[i] = _parse_error_update(e)
+    return results
 
 def execute_mcp_tool(state: AgentState, config: RunnableConfig) -> dict:
     """Execute the parsed MCP tool.
@@ -100,7 +674,7 @@ def execute_mcp_tool(state: AgentState, config: RunnableConfig) -> dict:
     Actual tool execution will be implemented later with MCP server classes.
     """
     logger.debug("Entering execute_mcp_tool")
-    parsed_command = state.get('parsed_command')
+    parsed_command = state.parsed_command
     if not parsed_command:
         return {"tool_output": None, "error_message": "No command was parsed for execution."}
 
@@ -124,46 +698,113 @@ def execute_mcp_tool(state: AgentState, config: RunnableConfig) -> dict:
     logger.debug("Mock tool output: %s", output)
     return {"tool_output": output, "error_message": None}
 
+# Dates and dataclasses are passed through so that, as with json.dumps, they fail
+# orjson and the output is rendered with str() instead
+_FORMAT_OUTPUT_OPTIONS = (
+    orjson.OPT_INDENT_2
+    | orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+)
+
+
+def _contains_non_finite(value) -> bool:
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(_contains_non_finite(k) or _contains_non_finite(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return any(_contains_non_finite(v) for v in value)
+    return False
+
+
+def _format_output(tool_output) -> str:
+    """Render a tool output for display."""
+    if tool_output is None:
+        return "No output from tool or an earlier error occurred."
+    if isinstance(tool_output, str):
+        return tool_output
+    # Basic formatting for non-string outputs (e.g., lists, dicts)
+    try:
+        rendered = orjson.dumps(tool_output, option=_FORMAT_OUTPUT_OPTIONS).decode()
+    except orjson.JSONEncodeError:
+        rendered = None
+    # orjson writes NaN and infinities as null; only outputs containing null can be affected
+    if rendered is not None and not ("null" in rendered and _contains_non_finite(tool_output)):
+        return rendered
+    # orjson rejects some values json accepts, e.g. integers wider than 64 bits
+    try:
+        return json.dumps(tool_output, indent=2, ensure_ascii=False)
+    except (TypeError, ValueError):
+        return str(tool_output)
+
+
 def format_tool_output(state: AgentState, config: RunnableConfig) -> dict:
     """Format the tool's output for display.
 
     Placeholder: For now, it's a simple pass-through or basic formatting.
     """
     logger.debug("Entering format_tool_output")
-    if state.get('error_message'):
+    if state.error_message:
         # If there's an error message, that should be the primary output to the user
-        final_output = f"Error: {state['error_message']}"
+        final_output = f"Error: {state.error_message}"
         logger.debug("Formatting error message: %s", final_output)
         # Clear error after displaying, or decide on error handling flow
         return {"tool_output": final_output, "error_message": None, "parsed_command": None, "user_command": None}
 
-    tool_output = state.get('tool_output')
-    if tool_output is None:
-        final_output = "No output from tool or an earlier error occurred."
-    elif isinstance(tool_output, str):
-        final_output = tool_output
-    else:
-        # Basic formatting for non-string outputs (e.g., lists, dicts)
-        import json
-        try:
-            final_output = json.dumps(tool_output, indent=2)
-        except TypeError:
-            final_output = str(tool_output)
+    final_output = _format_output(state.tool_output)
 
     logger.debug("Formatted output: %s", final_output)
     # Reset state for next command
     return {"tool_output": final_output, "parsed_command": None, "user_command": None}
 
 
+def _run_fused(state: AgentState, config: RunnableConfig, parse_update: dict) -> dict:
+    """Apply execute_mcp_tool and format_tool_output inline to a parse result."""
+    update = dict(parse_update)
+    state = replace(state, **parse_update)
+    if should_execute_tool(state) == "execute_mcp_tool":
+        execute_update = execute_mcp_tool(state, config)
+        update.update(execute_update)
+        state = replace(state, **execute_update)
+    update.update(format_tool_output(state, config))
+    return update
+
+
+def handle_command(state: AgentState, config: RunnableConfig) -> dict:
+    """Parse, execute and format the user's command in a single node.
+
+    Produces the same final state as parse_user_command -> execute_mcp_tool ->
+    format_tool_output, without the scheduler steps and state writes between
+    nodes. Used when Configuration.fused is set; while execution is mocked there
+    is nothing to gain from keeping the steps apart.
+    """
+    logger.debug("Entering handle_command")
+    return _run_fused(state, config, parse_user_command(state, config))
+
+
+async def ahandle_command(state: AgentState, config: RunnableConfig) -> dict:
+    """Async variant of handle_command."""
+    logger.debug("Entering ahandle_command")
+    return _run_fused(state, config, await aparse_user_command(state, config))
+
+
 # --- Conditional Edge Logic ---
 
+def route_command(state: AgentState, config: RunnableConfig) -> str:
+    """Return the entry node: the fused handler or the multi-node pipeline."""
+    if Configuration.from_runnable_config(config).fused:
+        logger.debug("Fused mode, routing to handle_command")
+        return "handle_command"
+    return "parse_user_command"
+
 def should_execute_tool(state: AgentState) -> str:
     """Return the next node based on parsing results."""
     logger.debug("Entering should_execute_tool")
-    if state.get('error_message'):
+    if state.error_message:
         logger.debug("Error detected, routing to format_tool_output")
         return "format_tool_output" # Route to format output to show the error
-    if state.get('parsed_command') and state['parsed_command'].get('tool_name') != "NoSuitableToolFound":
+    if state.parsed_command and state.parsed_command.get('tool_name') != "NoSuitableToolFound":
         logger.debug("Command parsed, routing to execute_mcp_tool")
         return "execute_mcp_tool"
     logger.debug("No suitable tool or error in parsing, routing to format_tool_output")
@@ -174,11 +815,26 @@ def should_execute_tool(state: AgentState) -> str:
 
 builder = StateGraph(AgentState)
 
-builder.add_node("parse_user_command", parse_user_command)
+# Sync invoke/stream use parse_user_command; ainvoke/astream await the Gemini call natively
+builder.add_node(
+    "parse_user_command",
+    RunnableLambda(parse_user_command, afunc=aparse_user_command, name="parse_user_command"),
+)
 builder.add_node("execute_mcp_tool", execute_mcp_tool)
 builder.add_node("format_tool_output", format_tool_output)
+builder.add_node(
+    "handle_command",
+    RunnableLambda(handle_command, afunc=ahandle_command, name="handle_command"),
+)
 
-builder.add_edge(START, "parse_user_command")
+builder.add_conditional_edges(
+    START,
+    route_command,
+    {
+        "parse_user_command": "parse_user_command",
+        "handle_command": "handle_command" # Single-node fast path when config.fused is set
+    }
+)
 
 builder.add_conditional_edges(
     "parse_user_command",
@@ -191,6 +847,7 @@ builder.add_conditional_edges(
 
 builder.add_edge("execute_mcp_tool", "format_tool_output")
 builder.add_edge("format_tool_output", END) # End of a single command processing cycle
+builder.add_edge("handle_command", END)
 
 # Compile the graph
 agent_graph = builder.compile()
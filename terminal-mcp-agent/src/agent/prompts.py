@@ -9,7 +9,6 @@ def get_current_date():
 COMMAND_PARSER_INSTRUCTIONS = """
 You are an expert at understanding natural language commands and translating them into structured tool calls.
 Your goal is to identify the appropriate tool and extract its arguments from the user's command.
-The current date is {current_date}.
 
 Available Tools:
 1.  **ListFilesTool**: Lists files and directories.
@@ -63,6 +62,31 @@ Example for "make a new directory called 'my photos'":
 ```
 """
 
+# Split once around the two {user_command} placeholders so building a prompt is
+# plain concatenation rather than a str.format pass over the whole template,
+# which also has to unescape every literal JSON brace.
+_PARSER_HEAD, _PARSER_BETWEEN_COMMANDS, _PARSER_TAIL = (
+    COMMAND_PARSER_INSTRUCTIONS.format(user_command="\0").split("\0")
+)
+
+def build_command_parser_prompt(user_command):
+    """Return COMMAND_PARSER_INSTRUCTIONS filled in with the given command."""
+    return f"{_PARSER_HEAD}{user_command}{_PARSER_BETWEEN_COMMANDS}{user_command}{_PARSER_TAIL}"
+
+# The same instructions with every per-call placeholder removed, so the text is
+# identical across calls and can be uploaded once as Gemini cached content.
+COMMAND_PARSER_STATIC_INSTRUCTIONS = (
+    COMMAND_PARSER_INSTRUCTIONS
+    .replace('User Command: "{user_command}"\n\n', "")
+    .replace('"{user_command}"', '"<the user command>"')
+    .format()  # Unescape the literal JSON braces
+    + "\nThe user command is given in the next message.\n"
+)
+
+# The per-call remainder sent alongside COMMAND_PARSER_STATIC_INSTRUCTIONS.
+COMMAND_PARSER_COMMAND_PROMPT = """User Command: "{user_command}"
+"""
+
 # (Keep other prompts from the original file if they might be useful,
 # or remove them if they are purely for the old web research agent.
 # For now, let's remove the old ones to keep it clean.)
@@ -1,8 +1,10 @@
-from typing import TypedDict, Optional, List, Any
+from dataclasses import dataclass
+from typing import Optional, List, Any
 from langgraph.graph import add_messages
 from typing_extensions import Annotated
 
-class AgentState(TypedDict):
+@dataclass(slots=True)
+class AgentState:
     """
     Represents the state of the Terminal MCP Agent.
     """
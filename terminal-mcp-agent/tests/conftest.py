@@ -0,0 +1,21 @@
+import os
+
+# agent.graph refuses to import without a key; tests never reach the network.
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """Give the test an empty parse cache that persists under tmp_path."""
+    from agent import graph
+
+    monkeypatch.setattr(graph, "PARSE_CACHE_PATH", tmp_path / "parse_cache.pkl")
+    graph._parse_cache.clear()
+    graph._semantic_indexes.clear()
+    yield graph
+    # The writer has a single worker, so this returns once every queued save is done
+    graph._parse_cache_writer.submit(lambda: None).result()
+    graph._parse_cache.clear()
+    graph._semantic_indexes.clear()
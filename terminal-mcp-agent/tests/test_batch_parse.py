@@ -0,0 +1,112 @@
+import re
+
+import pytest
+from google.genai import errors as genai_errors
+
+from agent.tools_and_schemas import ParsedCommand
+
+MODEL = "gemini-test"
+CACHED = "cachedContents/1"
+
+
+def _client_error(code):
+    # Mirror langchain-google-genai, which re-raises client errors as its own type
+    error = RuntimeError(f"Error calling model ({code})")
+    error.__cause__ = genai_errors.ClientError(code, {"error": {"code": code, "message": "failed"}})
+    return error
+
+
+class FakeStructuredLLM:
+    """Answer each prompt with a ReadFileTool call on the command's last word."""
+
+    def __init__(self, fail=lambda command: None):
+        self.fail = fail
+        self.batches = []
+
+    def batch(self, prompts, config=None, return_exceptions=False):
+        assert return_exceptions
+        commands = [re.search(r'User Command: "(.*)"', prompt).group(1) for prompt in prompts]
+        self.batches.append(commands)
+        return [
+            self.fail(command) or {"tool_name": "ReadFileTool", "args": {"path": command.split()[-1]}}
+            for command in commands
+        ]
+
+
+@pytest.fixture
+def llms(cache, monkeypatch):
+    llms = {None: FakeStructuredLLM(), CACHED: FakeStructuredLLM()}
+    monkeypatch.setattr(cache, "_get_structured_llm", lambda model, temperature, cached=None: llms[cached])
+    monkeypatch.setattr(cache, "_get_context_cache", lambda model: CACHED)
+    return llms
+
+
+def _config(**configurable):
+    return {"configurable": {"query_generator_model": MODEL, **configurable}}
+
+
+def _read(path):
+    return {"parsed_command": {"tool_name": "ReadFileTool", "args": {"path": path}}, "error_message": None}
+
+
+def test_local_hits_skip_gemini_and_duplicates_are_sent_once(cache, llms):
+    cache._store_parse_result(
+        cache._parse_cache_key("show me b.md", MODEL), MODEL, None,
+        ParsedCommand(tool_name="ReadFileTool", args={"path": "b.md"}),
+    )
+    commands = ["ls src", "show me a.md", "show me b.md", "show me  a.md", "what is in c.md"]
+
+    results = cache.parse_user_commands_batch(commands, _config())
+
+    assert llms[None].batches == [["show me a.md", "what is in c.md"]]
+    assert results[0]["parsed_command"] == {"tool_name": "ListFilesTool", "args": {"path": "src"}}
+    assert results[1:] == [_read("a.md"), _read("b.md"), _read("a.md"), _read("c.md")]
+    assert cache._lookup_exact(cache._parse_cache_key("what is in c.md", MODEL)).args == {"path": "c.md"}
+
+
+def test_failed_item_does_not_affect_the_others(cache, llms):
+    llms[None].fail = lambda command: ValueError("not JSON") if "bad" in command else None
+
+    results = cache.parse_user_commands_batch(["show me bad.md", "show me a.md"], _config())
+
+    assert results == [
+        {"parsed_command": None, "error_message": "Error parsing command: not JSON"},
+        _read("a.md"),
+    ]
+    assert cache._lookup_exact(cache._parse_cache_key("show me bad.md", MODEL)) is None
+
+
+def test_dead_handle_items_are_resent_in_one_full_prompt_batch(cache, llms, monkeypatch):
+    dropped = []
+    monkeypatch.setattr(cache, "_drop_context_cache", lambda model, name, error: dropped.append(name))
+    llms[CACHED].fail = lambda command: _client_error(404) if "a.md" in command or "b.md" in command else None
+
+    commands = ["show me a.md", "show me b.md", "show me c.md"]
+    results = cache.parse_user_commands_batch(commands, _config(context_cache=True))
+
+    assert results == [_read("a.md"), _read("b.md"), _read("c.md")]
+    assert dropped == [CACHED]
+    assert llms[CACHED].batches == [commands]
+    assert llms[None].batches == [["show me a.md", "show me b.md"]]
+
+
+def test_other_cached_failures_are_not_resent(cache, llms, monkeypatch):
+    monkeypatch.setattr(cache, "_drop_context_cache", lambda *_: pytest.fail("handle should be kept"))
+    llms[CACHED].fail = lambda command: _client_error(429)
+
+    results = cache.parse_user_commands_batch(["show me a.md"], _config(context_cache=True))
+
+    assert results == [{"parsed_command": None, "error_message": "Error parsing command: Error calling model (429)"}]
+    assert llms[None].batches == []
+
+
+def test_embedding_failure_still_parses_the_batch(cache, llms, monkeypatch):
+    class FailingEmbeddings:
+        def embed_documents(self, texts, task_type=None):
+            raise RuntimeError("quota exceeded")
+
+    monkeypatch.setattr(cache, "_get_embeddings", lambda: FailingEmbeddings())
+
+    results = cache.parse_user_commands_batch(["show me a.md"], _config(semantic_cache=True))
+
+    assert results == [_read("a.md")]
@@ -0,0 +1,119 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+from google.genai import errors as genai_errors
+
+from agent import graph
+
+MODEL = "gemini-test"
+
+
+class FakeClient:
+    def __init__(self, total_tokens):
+        self.total_tokens = total_tokens
+        self.created = 0
+        self.deleted = []
+        self.models = SimpleNamespace(count_tokens=self._count_tokens)
+        self.caches = SimpleNamespace(create=self._create, update=lambda **_: None, delete=self._delete)
+
+    def _count_tokens(self, model, contents):
+        return SimpleNamespace(total_tokens=self.total_tokens)
+
+    def _create(self, model, config):
+        self.created += 1
+        return SimpleNamespace(name=f"cachedContents/{self.created}")
+
+    def _delete(self, name):
+        self.deleted.append(name)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def install(total_tokens):
+        fake = FakeClient(total_tokens)
+        monkeypatch.setattr(graph, "_genai_client", fake)
+        monkeypatch.setattr(graph, "_context_caches", {})
+        return fake
+
+    return install
+
+
+def test_small_prompt_is_never_uploaded(client):
+    fake = client(graph.CONTEXT_CACHE_MIN_TOKENS - 1)
+    assert graph._get_context_cache(MODEL) is None
+    assert graph._get_context_cache(MODEL) is None
+    assert fake.created == 0
+
+
+def test_concurrent_first_calls_share_one_handle(client):
+    fake = client(graph.CONTEXT_CACHE_MIN_TOKENS)
+    names = []
+    threads = [threading.Thread(target=lambda: names.append(graph._get_context_cache(MODEL))) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert fake.created == 1
+    assert set(names) == {"cachedContents/1"}
+
+
+def test_dropped_handle_is_deleted_and_recreation_deferred(client):
+    fake = client(graph.CONTEXT_CACHE_MIN_TOKENS)
+    name = graph._get_context_cache(MODEL)
+    graph._drop_context_cache(MODEL, name, RuntimeError("expired"))
+    graph._drop_context_cache(MODEL, name, RuntimeError("expired"))
+    assert fake.deleted == [name]
+    assert graph._get_context_cache(MODEL) is None
+    assert fake.created == 1
+
+
+def _client_error(code):
+    # Mirror langchain-google-genai, which re-raises client errors as its own type
+    error = RuntimeError(f"Error calling model ({code})")
+    error.__cause__ = genai_errors.ClientError(code, {"error": {"code": code, "message": "failed"}})
+    return error
+
+
+class FakeStructuredLLM:
+    def __init__(self, error=None):
+        self.error = error
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        if self.error is not None:
+            raise self.error
+        return {"tool_name": "ListFilesTool", "args": {"path": "."}}
+
+
+@pytest.fixture
+def parser(monkeypatch):
+    def install(error):
+        if isinstance(error, int):
+            error = _client_error(error)
+        llms = {"cachedContents/1": FakeStructuredLLM(error), None: FakeStructuredLLM()}
+        dropped = []
+        monkeypatch.setattr(graph, "_get_context_cache", lambda model: "cachedContents/1")
+        monkeypatch.setattr(graph, "_get_structured_llm", lambda model, temperature, cached=None: llms[cached])
+        monkeypatch.setattr(graph, "_drop_context_cache", lambda *args: dropped.append(args[1]))
+        return llms, dropped
+
+    return install
+
+
+@pytest.mark.parametrize("code", [403, 404])
+def test_dead_handle_falls_back_to_full_prompt(parser, code):
+    llms, dropped = parser(code)
+    assert graph._invoke_parser("list files please", MODEL, context_cache=True)["tool_name"] == "ListFilesTool"
+    assert dropped == ["cachedContents/1"]
+    assert len(llms[None].prompts) == 1
+
+
+@pytest.mark.parametrize("error", [429, TimeoutError("timed out"), ValueError("not JSON")])
+def test_other_failures_keep_the_handle(parser, error):
+    llms, dropped = parser(error)
+    with pytest.raises(Exception):
+        graph._invoke_parser("list files please", MODEL, context_cache=True)
+    assert dropped == []
+    assert llms[None].prompts == []
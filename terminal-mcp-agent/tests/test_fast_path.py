@@ -0,0 +1,55 @@
+import pytest
+
+from agent.graph import _match_fast_path
+
+
+@pytest.mark.parametrize(
+    "command, tool_name, path",
+    [
+        ("ls", "ListFilesTool", "."),
+        ("ls src", "ListFilesTool", "src"),
+        ("list files", "ListFilesTool", "."),
+        ("list files in my_documents", "ListFilesTool", "my_documents"),
+        ("ls in src", "ListFilesTool", "src"),
+        ("cat /etc/passwd", "ReadFileTool", "/etc/passwd"),
+        ("read /etc/hosts", "ReadFileTool", "/etc/hosts"),
+        ("cat foo'", "ReadFileTool", "foo'"),
+        ("mkdir new_project", "CreateDirectoryTool", "new_project"),
+        ("mkdir 'my photos'", "CreateDirectoryTool", "my photos"),
+        ('mkdir "my photos"', "CreateDirectoryTool", "my photos"),
+        ("create a folder called temp_files", "CreateDirectoryTool", "temp_files"),
+        ("create directory build", "CreateDirectoryTool", "build"),
+    ],
+)
+def test_unambiguous_commands_skip_the_llm(command, tool_name, path):
+    parsed = _match_fast_path(command)
+    assert parsed is not None
+    assert parsed.tool_name == tool_name
+    assert parsed.args == {"path": path}
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        "list",
+        "list everything",
+        "list all",
+        "list directories",
+        "list files in",
+        "ls in",
+        "ls -la",
+        "ls 'unterminated",
+        "read me",
+        "read it",
+        "cat a b",
+        "show me what's in requirements.txt",
+        "create a folder called",
+        "create a directory called",
+        "mkdir called",
+        "mkdir -p a/b",
+        "make a new directory called 'my photos'",
+        "what's the weather like?",
+    ],
+)
+def test_ambiguous_commands_fall_through_to_the_llm(command):
+    assert _match_fast_path(command) is None
@@ -0,0 +1,75 @@
+import dataclasses
+import datetime
+import enum
+import json
+import uuid
+
+import pytest
+
+from agent.graph import _format_output
+
+
+@pytest.mark.parametrize(
+    "tool_output",
+    [
+        {"files": ["a.txt", "b.txt", "résumé.pdf"], "count": 3},
+        {1: "a", 2: "b"},
+        {"size": 2**70},
+        [2**64, -(2**63) - 1],
+    ],
+)
+def test_matches_json_dumps(tool_output):
+    assert _format_output(tool_output) == json.dumps(tool_output, indent=2, ensure_ascii=False)
+
+
+def test_unserializable_falls_back_to_str():
+    tool_output = {"value": object()}
+    assert _format_output(tool_output) == str(tool_output)
+
+
+def test_str_and_none():
+    assert _format_output("plain text") == "plain text"
+    assert _format_output(None) == "No output from tool or an earlier error occurred."
+
+
+@pytest.mark.parametrize(
+    "tool_output",
+    [
+        {"ratio": float("nan")},
+        [float("inf"), None, -float("inf")],
+        {"sizes": (1.5, float("nan"))},
+    ],
+)
+def test_non_finite_floats_match_json_dumps(tool_output):
+    assert _format_output(tool_output) == json.dumps(tool_output, indent=2, ensure_ascii=False)
+
+
+@dataclasses.dataclass
+class _Entry:
+    name: str
+
+
+@pytest.mark.parametrize(
+    "tool_output",
+    [
+        {"modified": datetime.datetime(2024, 5, 1, 12, 30)},
+        [datetime.date(2024, 5, 1)],
+        _Entry("a.txt"),
+        [_Entry("a.txt")],
+    ],
+)
+def test_dates_and_dataclasses_fall_back_to_str(tool_output):
+    assert _format_output(tool_output) == str(tool_output)
+
+
+class _Kind(enum.Enum):
+    FILE = "file"
+
+
+def test_known_differences_from_json_dumps():
+    # orjson renders enums and UUIDs as their values, where json.dumps would fail
+    assert _format_output([_Kind.FILE, uuid.UUID(int=1)]) == (
+        '[\n  "file",\n  "00000000-0000-0000-0000-000000000001"\n]'
+    )
+    # Exponents are not zero-padded
+    assert _format_output([1.5e-7]) == "[\n  1.5e-7\n]"
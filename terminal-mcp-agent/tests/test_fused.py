@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+MODEL = "gemini-test"
+
+
+def _reply(user_command):
+    if "explode" in user_command:
+        raise RuntimeError("model unavailable")
+    return {"tool_name": "NoSuitableToolFound", "args": {"original_command": user_command}}
+
+
+@pytest.fixture
+def graph(cache, monkeypatch):
+    async def fake_ainvoke_parser(user_command, model, context_cache):
+        return _reply(user_command)
+
+    monkeypatch.setattr(cache, "_invoke_parser", lambda user_command, model, context_cache: _reply(user_command))
+    monkeypatch.setattr(cache, "_ainvoke_parser", fake_ainvoke_parser)
+    return cache
+
+
+def _run(graph, user_command, fused, use_async):
+    config = {"configurable": {"query_generator_model": MODEL, "fused": fused}}
+    inputs = {"user_command": user_command}
+    if use_async:
+        return asyncio.run(graph.agent_graph.ainvoke(inputs, config=config))
+    return graph.agent_graph.invoke(inputs, config=config)
+
+
+@pytest.mark.parametrize("use_async", [False, True], ids=["invoke", "ainvoke"])
+@pytest.mark.parametrize(
+    "user_command, tool_output",
+    [
+        ("ls src", "Mock success: 'ListFilesTool' called with path 'src'"),
+        ("sing me a song", "Error: No suitable tool found for command: sing me a song"),
+        ("please explode", "Error: Error parsing command: model unavailable"),
+    ],
+    ids=["fast-path", "no-suitable-tool", "parse-error"],
+)
+def test_fused_matches_multi_node_pipeline(graph, user_command, tool_output, use_async):
+    fused = _run(graph, user_command, fused=True, use_async=use_async)
+    pipeline = _run(graph, user_command, fused=False, use_async=use_async)
+
+    assert fused == pipeline
+    assert fused["tool_output"] == tool_output
@@ -0,0 +1,124 @@
+import asyncio
+import pickle
+import threading
+
+import numpy as np
+import pytest
+
+from agent import graph
+from agent.tools_and_schemas import ParsedCommand
+
+MODEL = "gemini-2.0-flash"
+
+
+def _parsed(path):
+    return ParsedCommand(tool_name="ReadFileTool", args={"path": path})
+
+
+def _flush_writer():
+    # The writer has a single worker, so this returns once every queued save is done
+    graph._parse_cache_writer.submit(lambda: None).result()
+
+
+def test_key_depends_on_model_and_ignores_extra_whitespace():
+    assert graph._parse_cache_key("cat  a.txt ", MODEL) == graph._parse_cache_key("cat a.txt", MODEL)
+    assert graph._parse_cache_key("cat a.txt", MODEL) != graph._parse_cache_key("cat a.txt", "other-model")
+    assert graph._parse_cache_key("cat a.txt", MODEL) != graph._parse_cache_key("cat A.txt", MODEL)
+
+
+def test_cache_evicts_least_recently_used(cache, monkeypatch):
+    monkeypatch.setattr(cache, "PARSE_CACHE_MAX_ENTRIES", 2)
+    cache._store_parse_result("a", MODEL, None, _parsed("a"))
+    cache._store_parse_result("b", MODEL, None, _parsed("b"))
+    assert cache._lookup_exact("a") is not None  # "b" is now the oldest
+    cache._store_parse_result("c", MODEL, None, _parsed("c"))
+
+    assert cache._lookup_exact("b") is None
+    assert cache._lookup_exact("a").args == {"path": "a"}
+    assert cache._lookup_exact("c").args == {"path": "c"}
+
+
+def test_semantic_lookup_is_scoped_to_model(cache):
+    vector = np.array([1.0, 0.0], dtype=np.float32)
+    cache._store_parse_result("a", MODEL, vector, _parsed("a"))
+
+    assert cache._lookup_semantic(vector, MODEL).args == {"path": "a"}
+    assert cache._lookup_semantic(vector, "other-model") is None
+    assert cache._lookup_semantic(np.array([0.0, 1.0], dtype=np.float32), MODEL) is None
+
+
+def test_concurrent_stores_keep_vectors_and_parses_aligned(cache):
+    def store(i):
+        vector = np.zeros(64, dtype=np.float32)
+        vector[i] = 1.0
+        cache._store_parse_result(f"key-{i}", MODEL, vector, _parsed(f"file-{i}"))
+
+    threads = [threading.Thread(target=store, args=(i,)) for i in range(64)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    _flush_writer()
+
+    cache._parse_cache.clear()
+    cache._semantic_indexes.clear()
+    cache._load_parse_cache()
+    assert len(cache._parse_cache) == 64
+    for i in range(64):
+        vector = np.zeros(64, dtype=np.float32)
+        vector[i] = 1.0
+        assert cache._lookup_semantic(vector, MODEL).args == {"path": f"file-{i}"}
+    assert list(cache.PARSE_CACHE_PATH.parent.glob("*.tmp")) == []
+
+
+def test_cache_file_from_other_prompts_is_discarded(cache):
+    with cache.PARSE_CACHE_PATH.open("wb") as f:
+        pickle.dump({"version": "outdated", "entries": [("a", cache._CacheEntry(MODEL, _parsed("a"), None))]}, f)
+
+    cache._load_parse_cache()
+    assert cache._lookup_exact("a") is None
+
+
+def test_async_parse_caches_like_sync_parse(cache, monkeypatch):
+    calls = []
+
+    async def fake_ainvoke_parser(user_command, model, context_cache):
+        calls.append(user_command)
+        return {"tool_name": "ReadFileTool", "args": {"path": "notes.md"}}
+
+    monkeypatch.setattr(cache, "_ainvoke_parser", fake_ainvoke_parser)
+    monkeypatch.setattr(cache, "_invoke_parser", lambda *_: pytest.fail("sync parse should hit the cache"))
+    config = {"configurable": {"query_generator_model": MODEL}}
+    state = cache.AgentState(user_command="show me what notes.md says")
+
+    first = asyncio.run(cache.aparse_user_command(state, config))
+    second = asyncio.run(cache.aparse_user_command(state, config))
+    assert first == second == cache.parse_user_command(state, config)
+    assert first["parsed_command"] == {"tool_name": "ReadFileTool", "args": {"path": "notes.md"}}
+    assert calls == ["show me what notes.md says"]
+
+
+class _FailingEmbeddings:
+    def embed_query(self, text):
+        raise RuntimeError("quota exceeded")
+
+    async def aembed_query(self, text):
+        raise RuntimeError("quota exceeded")
+
+
+def test_embedding_failure_falls_back_to_gemini(cache, monkeypatch):
+    monkeypatch.setattr(cache, "_get_embeddings", lambda: _FailingEmbeddings())
+    monkeypatch.setattr(
+        cache, "_invoke_parser", lambda *_: {"tool_name": "ReadFileTool", "args": {"path": "a.md"}}
+    )
+
+    async def fake_ainvoke_parser(*_):
+        return {"tool_name": "ReadFileTool", "args": {"path": "b.md"}}
+
+    monkeypatch.setattr(cache, "_ainvoke_parser", fake_ainvoke_parser)
+    config = {"configurable": {"query_generator_model": MODEL, "semantic_cache": True}}
+
+    update = cache.parse_user_command(cache.AgentState(user_command="show me a.md"), config)
+    assert update == {"parsed_command": {"tool_name": "ReadFileTool", "args": {"path": "a.md"}}, "error_message": None}
+    update = asyncio.run(cache.aparse_user_command(cache.AgentState(user_command="show me b.md"), config))
+    assert update["parsed_command"]["args"] == {"path": "b.md"}